@@ -1,18 +1,51 @@
 from __future__ import annotations
 
+import math
+import re
+import zipfile
+from collections.abc import Iterable, Iterator
 from dataclasses import dataclass
-from decimal import Decimal, InvalidOperation, ROUND_HALF_UP, getcontext
+from decimal import Decimal, DecimalException, DefaultContext, ROUND_HALF_UP, getcontext
+from functools import lru_cache
 from io import BytesIO
 from typing import Any
+from xml.sax.saxutils import escape
 
+import numpy as np
 from flask import Flask, render_template, request, send_file
-from openpyxl import Workbook
-from openpyxl.styles import Alignment, Font
+from flask_compress import Compress
 
 
 app = Flask(__name__)
 
-getcontext().prec = 28
+# Страница с графиком на 30 лет — сотни килобайт повторяющейся разметки,
+# сжатие ужимает её в разы. XLSX уже zip — его не трогаем.
+app.config["COMPRESS_MIMETYPES"] = ["text/html", "text/css", "application/javascript"]
+app.config["COMPRESS_LEVEL"] = 5
+app.config["COMPRESS_MIN_SIZE"] = 1024
+Compress(app)
+
+# Для округления до копейки хватает 16 значащих цифр: суммы < 10^12 ₽
+# (см. _MAX_MONEY) в копейках — 14 цифр, аннуитетный множитель добавляет
+# к ним ~1e-15 относительной погрешности. Меньше цифр — меньше работы на
+# каждую операцию Decimal. Контекст Decimal потоко-локален: DefaultContext
+# наследуют новые потоки (воркеры сервера), getcontext — текущий поток.
+DefaultContext.prec = 16
+getcontext().prec = 16
+
+# Константы горячих путей — чтобы не аллоцировать одни и те же Decimal
+# в каждом вызове и каждой итерации.
+_Q2 = Decimal("0.01")  # квант округления до копейки
+_D0 = Decimal(0)
+_D1 = Decimal(1)
+_D12 = Decimal(12)
+_D100 = Decimal(100)
+_D0_00 = Decimal("0.00")
+_D0_05 = Decimal("0.05")
+
+# Верхняя граница денежных полей — выше неё расчёт в копейках не влезает
+# в prec=16 и quantize поднял бы InvalidOperation.
+_MAX_MONEY = Decimal(10) ** 12
 
 
 @dataclass(frozen=True)
@@ -22,24 +55,31 @@ class MortgageResult:
     overpayment_percent: Decimal
 
 
+# Один translate вместо цепочки replace; регулярка отсекает мусор до
+# конструктора Decimal (и заодно экспоненты вроде "1e5" в денежном поле).
+_NUM_TRANSLATE = str.maketrans({" ": "", " ": "", ",": "."})
+_NUM_RE = re.compile(r"^-?\d+(?:\.\d+)?$")
+
+
 def _to_decimal(value: str) -> Decimal:
-    value = (value or "").strip().replace(" ", "").replace(",", ".")
+    value = (value or "").strip().translate(_NUM_TRANSLATE)
     if value == "":
         raise ValueError("Пустое значение")
-    try:
-        return Decimal(value)
-    except InvalidOperation as exc:
-        raise ValueError("Некорректное число") from exc
+    if _NUM_RE.match(value) is None:
+        raise ValueError("Некорректное число")
+    return Decimal(value)
 
 
-def calculate_mortgage(
+def _validated_principal_months(
     home_price: Decimal,
     down_payment: Decimal,
     years: Decimal,
     annual_rate_percent: Decimal,
-) -> tuple[MortgageResult, list[dict[str, Decimal]]]:
+) -> tuple[Decimal, int]:
     if home_price <= 0:
         raise ValueError("Стоимость жилья должна быть больше 0")
+    if home_price > _MAX_MONEY:
+        raise ValueError("Стоимость жилья слишком велика")
     if down_payment < 0:
         raise ValueError("Первоначальный взнос не может быть отрицательным")
     if down_payment >= home_price:
@@ -51,95 +91,323 @@ def calculate_mortgage(
 
     principal = home_price - down_payment
 
-    months = (years * Decimal(12))
+    months = (years * _D12)
     if months != months.to_integral_value():
         raise ValueError("Срок кредита должен быть целым числом лет (например, 15)")
-    months_i = int(months)
+    return principal, int(months)
+
+
+def compute_summary(
+    home_price: Decimal,
+    down_payment: Decimal,
+    years: Decimal,
+    annual_rate_percent: Decimal,
+) -> MortgageResult:
+    """Итоговые цифры (платёж, переплата) — замкнутая форма, без графика."""
+    principal, months_i = _validated_principal_months(
+        home_price, down_payment, years, annual_rate_percent
+    )
 
     if annual_rate_percent == 0:
-        monthly = (principal / Decimal(months_i)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        pow_n_minus_1 = _D0
+    else:
+        r = (annual_rate_percent / _D100) / _D12  # месячная ставка
+        # Decimal ** считает exp(n*ln(1+r)) с высокой точностью — десятки
+        # аллокаций; для округления до копейки хватает double. Фактор
+        # (1+r)^n - 1 формируется через expm1(n*log1p(r)) — без вычитания
+        # единицы, которое при крошечных r съедала бы погрешность double.
+        # Для экстремальных входов — прежний Decimal-путь.
+        if months_i <= 600 and r <= _D0_05:
+            pow_n_minus_1 = Decimal(repr(math.expm1(months_i * math.log1p(float(r)))))
+        else:
+            pow_n_minus_1 = (_D1 + r) ** Decimal(months_i) - _D1
+
+    if pow_n_minus_1 == 0:
+        # Нулевая ставка — либо настолько малая, что (1+r)^n неотличима
+        # от единицы: аннуитет вырождается в равные доли тела.
+        monthly = (principal / Decimal(months_i)).quantize(_Q2, rounding=ROUND_HALF_UP)
         total_paid = monthly * Decimal(months_i)
     else:
-        r = (annual_rate_percent / Decimal(100)) / Decimal(12)  # месячная ставка
-        one_plus_r_pow_n = (Decimal(1) + r) ** Decimal(months_i)
-        monthly_raw = principal * (r * one_plus_r_pow_n) / (one_plus_r_pow_n - Decimal(1))
-        monthly = monthly_raw.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-        total_paid = (monthly * Decimal(months_i)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-
-    overpayment_rub = (total_paid - principal).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-    overpayment_percent = (overpayment_rub / principal * Decimal(100)).quantize(
-        Decimal("0.01"), rounding=ROUND_HALF_UP
+        monthly_raw = principal * r * (pow_n_minus_1 + _D1) / pow_n_minus_1
+        monthly = monthly_raw.quantize(_Q2, rounding=ROUND_HALF_UP)
+        total_paid = (monthly * Decimal(months_i)).quantize(_Q2, rounding=ROUND_HALF_UP)
+
+    overpayment_rub = (total_paid - principal).quantize(_Q2, rounding=ROUND_HALF_UP)
+    overpayment_percent = (overpayment_rub / principal * _D100).quantize(
+        _Q2, rounding=ROUND_HALF_UP
     )
 
-    # Построение графика платежей
-    schedule: list[dict[str, Decimal]] = []
-    balance = principal
+    return MortgageResult(
+        monthly_payment_rub=monthly,
+        overpayment_rub=overpayment_rub,
+        overpayment_percent=overpayment_percent,
+    )
 
-    if annual_rate_percent == 0:
-        for month_index in range(1, months_i + 1):
-            if month_index == months_i:
-                principal_part = balance
-                payment = principal_part
-            else:
-                principal_part = monthly
-                payment = monthly
-            interest_part = Decimal("0.00")
-            balance = (balance - principal_part).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-            if balance < Decimal("0"):
-                balance = Decimal("0.00")
-            schedule.append(
-                {
-                    "month": Decimal(month_index),
-                    "payment": payment,
-                    "interest": interest_part,
-                    "principal": principal_part,
-                    "balance": balance,
-                }
-            )
+
+def iter_schedule_rows(
+    home_price: Decimal,
+    down_payment: Decimal,
+    years: Decimal,
+    annual_rate_percent: Decimal,
+    result: MortgageResult,
+) -> Iterator[tuple[int, int, int, int, int]]:
+    """Строки графика примитивами: (месяц, платёж, проценты, тело, остаток).
+
+    Суммы — целые копейки. Генератор позволяет писать строки сразу в
+    потребителя (например, в XLSX), не материализуя список Decimal-записей.
+    """
+    principal, months_i = _validated_principal_months(
+        home_price, down_payment, years, annual_rate_percent
+    )
+    monthly = result.monthly_payment_rub
+    principal_kop_total = int(principal.scaleb(2).to_integral_value(rounding=ROUND_HALF_UP))
+    monthly_kop = int(monthly.scaleb(2))
+
+    r = _D0 if annual_rate_percent == 0 else (annual_rate_percent / _D100) / _D12
+    r_f = float(r)
+
+    if r_f == 0.0:
+        # Нулевая ставка (или настолько малая, что double её не отличает
+        # от нуля). Месяцы 1..N-1: платёж всегда равен monthly, последний
+        # месяц гасит остаток и строится один раз после цикла. Если платёж
+        # округлён вверх, остаток может кончиться раньше срока — прижимаем
+        # его к нулю, чтобы он не уходил в минус (как в исходной
+        # реализации).
+        balance_kop = principal_kop_total
+        for month_index in range(1, months_i):
+            balance_kop -= monthly_kop
+            if balance_kop < 0:
+                balance_kop = 0
+            yield (month_index, monthly_kop, 0, monthly_kop, balance_kop)
+        yield (months_i, balance_kop, 0, balance_kop, 0)
+        return
+
+    log1p_r = math.log1p(r_f)
+
+    # Замкнутая форма усиливает копеечные округления платежа и процентов
+    # примерно в (1+r)^n раз, поэтому помимо границ double-пути (как в
+    # compute_summary) векторный путь требует (1+r)^n <= 100: тогда
+    # расхождение с точной рекуррентностью — копейки, в худшем случае пара
+    # рублей к концу 30-летнего срока. Вне границ — целочисленная
+    # рекуррентность без потери точности.
+    if months_i <= 600 and r <= _D0_05 and math.expm1(months_i * log1p_r) <= 99.0:
+        # Остаток долга после k-го платежа имеет замкнутую форму
+        #   balance_k = P*(1+r)^k - M*((1+r)^k - 1)/r,
+        # поэтому весь график считается векторно, без цикла по месяцам.
+        # Фактор (1+r)^k - 1 берётся из expm1 — без вычитания единицы,
+        # съедающего точность при крошечных r (см. compute_summary).
+        # Округляем до копейки (HALF_UP) и дальше работаем в int64.
+        principal_f = float(principal)
+        monthly_f = float(monthly)
+
+        k = np.arange(1, months_i + 1)
+        pow_k_minus_1 = np.expm1(k * log1p_r)
+        balance_raw = principal_f * (pow_k_minus_1 + 1.0) - monthly_f * (pow_k_minus_1 / r_f)
+
+        balance_kop = np.floor(balance_raw * 100.0 + 0.5).astype(np.int64)
+        np.maximum(balance_kop, 0, out=balance_kop)
+        # Последний платёж гасит остаток полностью (скалярная поправка).
+        balance_kop[-1] = 0
+
+        prev_kop = np.empty(months_i, dtype=np.int64)
+        prev_kop[0] = principal_kop_total
+        prev_kop[1:] = balance_kop[:-1]
+
+        principal_kop = prev_kop - balance_kop
+        payment_kop = np.full(months_i, monthly_kop, dtype=np.int64)
+        payment_kop[-1] = int(prev_kop[-1] * r_f + 0.5) + principal_kop[-1]
+        interest_kop = payment_kop - principal_kop
+
+        yield from zip(
+            range(1, months_i + 1),
+            payment_kop.tolist(),
+            interest_kop.tolist(),
+            principal_kop.tolist(),
+            balance_kop.tolist(),
+        )
     else:
-        r = (annual_rate_percent / Decimal(100)) / Decimal(12)
-        for month_index in range(1, months_i + 1):
-            interest_part = (balance * r).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-            principal_part = (monthly - interest_part).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-            if month_index == months_i:
-                principal_part = balance
-                payment = (interest_part + principal_part).quantize(
-                    Decimal("0.01"), rounding=ROUND_HALF_UP
-                )
-            else:
-                payment = monthly
-            balance = (balance - principal_part).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-            if balance < Decimal("0"):
-                balance = Decimal("0.00")
-            schedule.append(
-                {
-                    "month": Decimal(month_index),
-                    "payment": payment,
-                    "interest": interest_part,
-                    "principal": principal_part,
-                    "balance": balance,
-                }
-            )
+        # Экстремальные ставка/срок: точная целочисленная рекуррентность —
+        # проценты округляются от текущего остатка каждый месяц.
+        balance_kop = principal_kop_total
+        for month_index in range(1, months_i):
+            interest_kop = int(balance_kop * r_f + 0.5)
+            principal_part_kop = monthly_kop - interest_kop
+            balance_kop -= principal_part_kop
+            if balance_kop < 0:
+                balance_kop = 0
+            yield (month_index, monthly_kop, interest_kop, principal_part_kop, balance_kop)
+        interest_kop = int(balance_kop * r_f + 0.5)
+        yield (months_i, interest_kop + balance_kop, interest_kop, balance_kop, 0)
+
+
+def compute_schedule(
+    home_price: Decimal,
+    down_payment: Decimal,
+    years: Decimal,
+    annual_rate_percent: Decimal,
+    result: MortgageResult,
+) -> list[dict[str, Decimal]]:
+    """График платежей по уже рассчитанным итогам (см. compute_summary)."""
+    return [
+        {
+            "month": Decimal(month),
+            "payment": Decimal(payment_kop).scaleb(-2),
+            "interest": Decimal(interest_kop).scaleb(-2),
+            "principal": Decimal(principal_kop).scaleb(-2),
+            "balance": Decimal(balance_kop).scaleb(-2),
+        }
+        for month, payment_kop, interest_kop, principal_kop, balance_kop in iter_schedule_rows(
+            home_price, down_payment, years, annual_rate_percent, result
+        )
+    ]
+
 
-    return (
-        MortgageResult(
-            monthly_payment_rub=monthly,
-            overpayment_rub=overpayment_rub,
-            overpayment_percent=overpayment_percent,
-        ),
-        schedule,
+def calculate_mortgage(
+    home_price: Decimal,
+    down_payment: Decimal,
+    years: Decimal,
+    annual_rate_percent: Decimal,
+) -> tuple[MortgageResult, list[dict[str, Decimal]]]:
+    result = compute_summary(home_price, down_payment, years, annual_rate_percent)
+    schedule = compute_schedule(
+        home_price, down_payment, years, annual_rate_percent, result=result
+    )
+    return result, schedule
+
+
+@lru_cache(maxsize=256)
+def _calc_cached(
+    home_price_s: str,
+    down_payment_s: str,
+    years_s: str,
+    rate_s: str,
+) -> tuple[MortgageResult, list[dict[str, Decimal]]]:
+    """Кэш расчёта по сырым строкам формы.
+
+    Одна и та же отправка формы проходит через /calculate, а затем через
+    /export_excel при скачивании — без кэша график считался бы дважды.
+    """
+    return calculate_mortgage(
+        home_price=_to_decimal(home_price_s),
+        down_payment=_to_decimal(down_payment_s),
+        years=_to_decimal(years_s),
+        annual_rate_percent=_to_decimal(rate_s),
+    )
+
+
+@lru_cache(maxsize=256)
+def _summary_cached(
+    home_price_s: str,
+    down_payment_s: str,
+    years_s: str,
+    rate_s: str,
+) -> MortgageResult:
+    """Кэш только итоговых цифр — когда график платежей не запрошен."""
+    return compute_summary(
+        home_price=_to_decimal(home_price_s),
+        down_payment=_to_decimal(down_payment_s),
+        years=_to_decimal(years_s),
+        annual_rate_percent=_to_decimal(rate_s),
     )
 
 
+@lru_cache(maxsize=4096)
 def _fmt_rub(amount: Decimal) -> str:
-    # 1 234 567.89
-    s = f"{amount:.2f}"
-    int_part, frac = s.split(".")
-    chunks = []
-    while int_part:
-        chunks.append(int_part[-3:])
-        int_part = int_part[:-3]
-    return f"{' '.join(reversed(chunks))}.{frac}"
+    # 1 234 567.89. Группировку разрядов делает C-форматтер Decimal
+    # (без конвертации во float), остаётся одна замена разделителя.
+    # В аннуитетном графике платёж повторяется N-1 раз, поэтому кэш
+    # сводит форматирование повторов к одному вызову.
+    return format(amount, ",.2f").replace(",", " ")
+
+
+# Фильтр для шаблона: график передаётся как есть, без промежуточного
+# списка отформатированных словарей — форматирование происходит при выводе.
+app.jinja_env.filters["rub"] = _fmt_rub
+
+
+# Экспорт собирается вручную: лист с числами и одним числовым форматом —
+# слишком простая задача, чтобы платить за универсальную xlsx-библиотеку.
+# Ниже — неизменные части архива; sheet1.xml строится f-строками по графику.
+_XLSX_STATIC_PARTS: dict[str, str] = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        "</Types>"
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        "</Relationships>"
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+        ' xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="График" sheetId="1" r:id="rId1"/></sheets>'
+        "</workbook>"
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        "</Relationships>"
+    ),
+    # Стили: s=1 жирный, s=2 заголовок листа, s=3 шапка таблицы (по центру),
+    # s=4 номер месяца (влево), s=5 деньги '#,##0.00' (вправо).
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<numFmts count="1"><numFmt numFmtId="164" formatCode="#,##0.00"/></numFmts>'
+        '<fonts count="3">'
+        '<font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="14"/><name val="Calibri"/></font>'
+        "</fonts>"
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border/></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="6">'
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" applyFont="1"/>'
+        '<xf numFmtId="0" fontId="2" fillId="0" borderId="0" applyFont="1"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" applyFont="1" applyAlignment="1">'
+        '<alignment horizontal="center"/></xf>'
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" applyAlignment="1">'
+        '<alignment horizontal="left"/></xf>'
+        '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" applyNumberFormat="1" applyAlignment="1">'
+        '<alignment horizontal="right"/></xf>'
+        "</cellXfs>"
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        "</styleSheet>"
+    ),
+}
+
+_SHEET_XML_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<cols><col min="1" max="1" width="12" customWidth="1"/>'
+    '<col min="2" max="5" width="16" customWidth="1"/></cols>'
+    "<sheetData>"
+)
+
+_SHEET_XML_TAIL = (
+    '</sheetData><mergeCells count="1"><mergeCell ref="A1:E1"/></mergeCells></worksheet>'
+)
+
+
+def _kop_str(kop: int) -> str:
+    # 1234567 копеек -> "12345.67", без прохода через Decimal или float.
+    sign = "-" if kop < 0 else ""
+    rub, rest = divmod(abs(kop), 100)
+    return f"{sign}{rub}.{rest:02d}"
 
 
 def _build_schedule_xlsx(
@@ -150,17 +418,12 @@ def _build_schedule_xlsx(
     years: Decimal,
     annual_rate_percent: Decimal,
     result: MortgageResult,
-    schedule: list[dict[str, Decimal]],
+    rows: Iterable[tuple[int, int, int, int, int]],
 ) -> BytesIO:
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "График"
-
-    header_font = Font(bold=True)
-
-    ws["A1"] = title
-    ws["A1"].font = Font(bold=True, size=14)
-    ws.merge_cells("A1:E1")
+    parts = [_SHEET_XML_HEAD]
+    parts.append(
+        f'<row r="1"><c r="A1" t="inlineStr" s="2"><is><t>{escape(title)}</t></is></c></row>'
+    )
 
     meta = [
         ("Стоимость жилья, ₽", home_price),
@@ -173,41 +436,39 @@ def _build_schedule_xlsx(
     ]
     row = 3
     for label, value in meta:
-        ws[f"A{row}"] = label
-        ws[f"A{row}"].font = header_font
-        ws[f"B{row}"] = float(value)
+        parts.append(
+            f'<row r="{row}"><c r="A{row}" t="inlineStr" s="1"><is><t>{escape(label)}</t></is></c>'
+            f'<c r="B{row}"><v>{value}</v></c></row>'
+        )
         row += 1
 
-    start_row = row + 1
-    headers = ["Месяц", "Платёж, ₽", "Проценты, ₽", "Тело, ₽", "Остаток, ₽"]
-    for col, h in enumerate(headers, start=1):
-        cell = ws.cell(row=start_row, column=col, value=h)
-        cell.font = header_font
-        cell.alignment = Alignment(horizontal="center")
-
-    for i, entry in enumerate(schedule, start=1):
-        r = start_row + i
-        ws.cell(row=r, column=1, value=int(entry["month"]))
-        ws.cell(row=r, column=2, value=float(entry["payment"]))
-        ws.cell(row=r, column=3, value=float(entry["interest"]))
-        ws.cell(row=r, column=4, value=float(entry["principal"]))
-        ws.cell(row=r, column=5, value=float(entry["balance"]))
-
-    # Форматы
-    for r in range(start_row + 1, start_row + 1 + len(schedule)):
-        ws.cell(row=r, column=1).alignment = Alignment(horizontal="left")
-        for c in (2, 3, 4, 5):
-            ws.cell(row=r, column=c).number_format = '#,##0.00'
-            ws.cell(row=r, column=c).alignment = Alignment(horizontal="right")
-
-    ws.column_dimensions["A"].width = 12
-    ws.column_dimensions["B"].width = 16
-    ws.column_dimensions["C"].width = 16
-    ws.column_dimensions["D"].width = 16
-    ws.column_dimensions["E"].width = 16
+    row += 1
+    header_cells = "".join(
+        f'<c r="{col}{row}" t="inlineStr" s="3"><is><t>{escape(h)}</t></is></c>'
+        for col, h in zip("ABCDE", ["Месяц", "Платёж, ₽", "Проценты, ₽", "Тело, ₽", "Остаток, ₽"])
+    )
+    parts.append(f'<row r="{row}">{header_cells}</row>')
+
+    # Строки приходят кортежами копеек прямо из iter_schedule_rows —
+    # список Decimal-записей для экспорта не строится вовсе.
+    for month, payment_kop, interest_kop, principal_kop, balance_kop in rows:
+        row += 1
+        parts.append(
+            f'<row r="{row}">'
+            f'<c r="A{row}" s="4"><v>{month}</v></c>'
+            f'<c r="B{row}" s="5"><v>{_kop_str(payment_kop)}</v></c>'
+            f'<c r="C{row}" s="5"><v>{_kop_str(interest_kop)}</v></c>'
+            f'<c r="D{row}" s="5"><v>{_kop_str(principal_kop)}</v></c>'
+            f'<c r="E{row}" s="5"><v>{_kop_str(balance_kop)}</v></c>'
+            "</row>"
+        )
+    parts.append(_SHEET_XML_TAIL)
 
     out = BytesIO()
-    wb.save(out)
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+        for name, data in _XLSX_STATIC_PARTS.items():
+            zf.writestr(name, data)
+        zf.writestr("xl/worksheets/sheet1.xml", "".join(parts))
     out.seek(0)
     return out
 
@@ -241,40 +502,48 @@ def calculate() -> str:
         "annual_rate_percent": request.form.get("annual_rate_percent", ""),
     }
 
-    try:
-        annual_rate = Decimal(0) if is_installment else _to_decimal(form["annual_rate_percent"])
+    want_schedule = request.form.get("want_schedule") == "1"
 
-        result, schedule = calculate_mortgage(
-            home_price=_to_decimal(form["home_price"]),
-            down_payment=_to_decimal(form["down_payment"]),
-            years=_to_decimal(form["years"]),
-            annual_rate_percent=annual_rate,
-        )
+    try:
+        rate_s = "0" if is_installment else form["annual_rate_percent"]
+        # Итоговые цифры считаются замкнутой формой; график строится только
+        # если он запрошен формой.
+        if want_schedule:
+            result, schedule = _calc_cached(
+                form["home_price"], form["down_payment"], form["years"], rate_s
+            )
+        else:
+            result = _summary_cached(
+                form["home_price"], form["down_payment"], form["years"], rate_s
+            )
+            schedule = None
         view_result: dict[str, Any] = {
             "monthly_payment_rub": _fmt_rub(result.monthly_payment_rub),
             "overpayment_rub": _fmt_rub(result.overpayment_rub),
             "overpayment_percent": f"{result.overpayment_percent:.2f}",
         }
 
-        schedule_view = [
-            {
-                "month": int(row["month"]),
-                "payment": _fmt_rub(row["payment"]),
-                "interest": _fmt_rub(row["interest"]),
-                "principal": _fmt_rub(row["principal"]),
-                "balance": _fmt_rub(row["balance"]),
-            }
-            for row in schedule
-        ]
-
         return render_template(
             "index.html",
             form=form,
             is_installment=is_installment,
             result=view_result,
-            schedule=schedule_view,
+            schedule=schedule,
             error=None,
         )
+    except DecimalException:
+        # Страховка: сочетание входов, с которым decimal не справился
+        # (переполнение prec=16, деление на вырожденный знаменатель),
+        # не должно ронять запрос в 500. DivisionByZero — сосед
+        # InvalidOperation, а не подкласс, поэтому ловим общего предка.
+        return render_template(
+            "index.html",
+            form=form,
+            is_installment=is_installment,
+            result=None,
+            schedule=None,
+            error="Слишком большие значения для расчёта",
+        )
     except ValueError as exc:
         return render_template(
             "index.html",
@@ -301,16 +570,17 @@ def export_excel():
     home_price = _to_decimal(form["home_price"])
     down_payment = _to_decimal(form["down_payment"])
     years = _to_decimal(form["years"])
-    annual_rate = Decimal(0) if is_installment else _to_decimal(form["annual_rate_percent"])
+    annual_rate = _D0 if is_installment else _to_decimal(form["annual_rate_percent"])
 
-    result, schedule = calculate_mortgage(
-        home_price=home_price,
-        down_payment=down_payment,
-        years=years,
-        annual_rate_percent=annual_rate,
+    result = _summary_cached(
+        form["home_price"],
+        form["down_payment"],
+        form["years"],
+        "0" if is_installment else form["annual_rate_percent"],
     )
 
     title = "Рассрочка" if is_installment else "Ипотека"
+    # График не материализуется: генератор строк уходит прямо в XLSX.
     xlsx = _build_schedule_xlsx(
         title=f"{title}: график платежей",
         home_price=home_price,
@@ -318,7 +588,7 @@ def export_excel():
         years=years,
         annual_rate_percent=annual_rate,
         result=result,
-        schedule=schedule,
+        rows=iter_schedule_rows(home_price, down_payment, years, annual_rate, result=result),
     )
 
     return send_file(